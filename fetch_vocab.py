@@ -9,15 +9,35 @@ Usage:
 """
 
 import os
-import json
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from operator import itemgetter
 from pathlib import Path
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from json_io import JSONDecodeError, loads, save_json
 
 API_KEY = os.environ.get("WANIKANI_API_KEY")
 BASE_URL = "https://api.wanikani.com/v2"
-
-def get_headers():
-    return {"Authorization": f"Bearer {API_KEY}"}
+MAX_WORKERS = 8  # Concurrent subject batch requests (WaniKani allows 60 req/min)
+
+# Shared session: keep-alive connection reuse + retry/backoff on rate limits
+SESSION = requests.Session()
+SESSION.headers.update({"Authorization": f"Bearer {API_KEY}"})
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=10,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504]),
+))
+
+def parse_response(response):
+    """Decode a JSON response body, skipping requests' charset detection."""
+    try:
+        return loads(response.content)
+    except (JSONDecodeError, UnicodeDecodeError):
+        pass  # e.g. non-UTF-8 body; let requests sniff the charset
+    return response.json()
 
 def fetch_assignments():
     """Fetch all vocabulary assignments at apprentice/guru level."""
@@ -27,35 +47,67 @@ def fetch_assignments():
         "srs_stages": "1,2,3,4,5,6",  # Apprentice 1-4, Guru 1-2
     }
 
-    assignments = []
+    assignments = None
+    idx = 0
     while url:
-        response = requests.get(url, headers=get_headers(), params=params)
+        response = SESSION.get(url, params=params, timeout=30)
         response.raise_for_status()
-        data = response.json()
-        assignments.extend(data["data"])
+        data = parse_response(response)
+        if assignments is None:
+            # Size the list once from the first page's total_count
+            assignments = [None] * data.get("total_count", 0)
+        batch = data["data"]
+        assignments[idx:idx + len(batch)] = batch
+        idx += len(batch)
         url = data["pages"].get("next_url")
         params = {}  # Clear params for pagination
-        print(f"Fetched {len(assignments)} assignments...")
+        print(f"Fetched {idx} assignments...")
 
+    if assignments is None:
+        return []
+    del assignments[idx:]  # In case fewer items arrived than reported
     return assignments
 
+def slim_subject(item):
+    """Copy out only the subject fields extract_vocab_data reads."""
+    data = item["data"]
+    return {
+        "id": item["id"],
+        "data": {
+            "characters": data.get("characters", ""),
+            "level": data.get("level", 0),
+            "readings": [
+                {"reading": r.get("reading", ""), "primary": r.get("primary", False)}
+                for r in data.get("readings", [])
+            ],
+            "meanings": [
+                {"meaning": m.get("meaning", ""), "primary": m.get("primary", False)}
+                for m in data.get("meanings", [])
+            ],
+        },
+    }
+
+def fetch_subject_batch(batch):
+    """Fetch one batch of subjects by ID."""
+    params = {"ids": ",".join(map(str, batch))}
+    response = SESSION.get(f"{BASE_URL}/subjects", params=params, timeout=30)
+    response.raise_for_status()
+    # Project down right away so the full payload can be freed per batch
+    return [slim_subject(item) for item in parse_response(response)["data"]]
+
 def fetch_subjects(subject_ids):
     """Fetch subject details for given IDs."""
     subjects = {}
-    # API allows up to 1000 IDs per request
-    for i in range(0, len(subject_ids), 500):
-        batch = subject_ids[i:i+500]
-        url = f"{BASE_URL}/subjects"
-        params = {"ids": ",".join(map(str, batch))}
-
-        response = requests.get(url, headers=get_headers(), params=params)
-        response.raise_for_status()
-        data = response.json()
-
-        for item in data["data"]:
-            subjects[item["id"]] = item
+    # API allows up to 1000 IDs per request; batches are independent, so
+    # fetch them concurrently over the shared session
+    batches = [subject_ids[i:i+500] for i in range(0, len(subject_ids), 500)]
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = [executor.submit(fetch_subject_batch, batch) for batch in batches]
+        for future in as_completed(futures):
+            items = future.result()
+            subjects.update((item["id"], item) for item in items)
 
-        print(f"Fetched {len(subjects)} subjects...")
+            print(f"Fetched {len(subjects)} subjects...")
 
     return subjects
 
@@ -64,21 +116,24 @@ def extract_vocab_data(assignments, subjects):
     vocab_list = []
 
     for assignment in assignments:
-        subject_id = assignment["data"]["subject_id"]
-        if subject_id not in subjects:
+        assignment_data = assignment["data"]
+        subject_id = assignment_data["subject_id"]
+        subject = subjects.get(subject_id)
+        if subject is None:
             continue
 
-        subject = subjects[subject_id]
         data = subject["data"]
 
         # Get primary reading and meaning
+        readings = data.get("readings") or [{}]
+        meanings = data.get("meanings") or [{}]
         primary_reading = next(
-            (r["reading"] for r in data.get("readings", []) if r.get("primary")),
-            data.get("readings", [{}])[0].get("reading", "")
+            (r["reading"] for r in readings if r.get("primary")),
+            readings[0].get("reading", "")
         )
         primary_meaning = next(
-            (m["meaning"] for m in data.get("meanings", []) if m.get("primary")),
-            data.get("meanings", [{}])[0].get("meaning", "")
+            (m["meaning"] for m in meanings if m.get("primary")),
+            meanings[0].get("meaning", "")
         )
 
         vocab_list.append({
@@ -87,11 +142,11 @@ def extract_vocab_data(assignments, subjects):
             "reading": primary_reading,
             "meaning": primary_meaning,
             "level": data.get("level", 0),
-            "srs_stage": assignment["data"]["srs_stage"],
+            "srs_stage": assignment_data["srs_stage"],
         })
 
     # Sort by SRS stage (lower = needs more practice)
-    vocab_list.sort(key=lambda x: (x["srs_stage"], x["level"]))
+    vocab_list.sort(key=itemgetter("srs_stage", "level"))
 
     return vocab_list
 
@@ -118,8 +173,7 @@ def main():
     output_path = Path(__file__).parent / "data" / "vocab.json"
     output_path.parent.mkdir(exist_ok=True)
 
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(vocab_list, f, ensure_ascii=False, indent=2)
+    save_json(vocab_list, output_path)
 
     print(f"\nSaved {len(vocab_list)} vocabulary items to {output_path}")
     print(f"Lowest SRS items (need most practice):")
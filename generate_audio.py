@@ -24,26 +24,52 @@ Usage:
     # Kokoro ONNX (High quality, on-device)
     python generate_audio.py --tts kokoro
 
+    # Existing up-to-date audio is skipped; re-render everything with
+    python generate_audio.py --force
+
 Requirements:
     pip install edge-tts        # for Edge TTS (recommended)
     pip install requests        # for VOICEVOX API
     pip install mlx-audio soundfile  # for Qwen (Apple Silicon)
     pip install kokoro-onnx soundfile # for Kokoro
+    pip install lameenc         # optional: in-process MP3 encoding instead of ffmpeg
 """
 
-import json
 import subprocess
 import argparse
+import asyncio
+import hashlib
+import io
 import wave
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-import time
-import re
+
+from json_io import load_json, save_json
 
 # Lazy imports for optional dependencies
 requests = None
+voicevox_session = None
 piper = None
 kokoro_obj = None
 misaki_g2p = None
+qwen_model = None
+
+# Qwen model and voice configuration
+QWEN_MODEL_ID = "mlx-community/Qwen3-TTS-12Hz-0.6B-Base-4bit"
+QWEN_VOICE = "Ono_Anna"  # Playful Japanese female voice
+
+MANIFEST_SAVE_EVERY = 50  # Checkpoint manifest.json so interrupted runs can resume
+
+# Engines backed by an external process/server, safe to run from worker threads
+THREADED_ENGINES = {"macos", "voicevox"}
+
+def ensure_requests():
+    global requests, voicevox_session
+    if requests is None:
+        import requests as requests_module
+        requests = requests_module
+        # Shared keep-alive pool to the local VOICEVOX server across worker threads
+        voicevox_session = requests.Session()
 
 def get_kokoro():
     global kokoro_obj
@@ -57,6 +83,14 @@ def get_kokoro():
         kokoro_obj = Kokoro(str(model_path), str(voices_path))
     return kokoro_obj
 
+def get_qwen():
+    global qwen_model
+    if qwen_model is None:
+        # Load the weights once, not on every sentence
+        from mlx_audio.tts.utils import load_model
+        qwen_model = load_model(QWEN_MODEL_ID)
+    return qwen_model
+
 def get_misaki():
     global misaki_g2p
     if misaki_g2p is None:
@@ -73,11 +107,100 @@ def get_misaki():
                 return None
     return misaki_g2p
 
+def run_quiet(cmd: list):
+    """Run cmd with stdout discarded; only stderr is kept, for the error message."""
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        stderr = result.stderr.decode('utf-8', errors='replace').strip()
+        raise RuntimeError(f"{cmd[0]} exited with {result.returncode}: {stderr}")
+
+def encode_mp3(pcm: bytes, sample_rate: int, output_path: Path, channels: int = 1) -> bool:
+    """Encode 16-bit PCM straight to MP3 in-process (no ffmpeg spawn).
+
+    Returns False if lameenc is not installed so callers can fall back to ffmpeg.
+    """
+    try:
+        import lameenc
+    except ImportError:
+        return False
+
+    encoder = lameenc.Encoder()
+    encoder.set_bit_rate(128)
+    encoder.set_in_sample_rate(sample_rate)
+    encoder.set_channels(channels)
+    encoder.set_quality(2)
+    output_path.write_bytes(encoder.encode(pcm) + encoder.flush())
+    return True
+
+def encode_wav_as_mp3(wav_file, output_path: Path) -> bool:
+    """Encode a 16-bit PCM WAV (path or file object) to MP3 in-process."""
+    with wave.open(wav_file, 'rb') as wav:
+        if wav.getsampwidth() != 2:
+            return False
+        pcm = wav.readframes(wav.getnframes())
+        return encode_mp3(pcm, wav.getframerate(), output_path, wav.getnchannels())
+
+def save_samples(samples, sample_rate: int, output_path: Path):
+    """Save float samples as MP3 (lameenc, else ffmpeg), keeping WAV as a last resort."""
+    import numpy as np
+    import soundfile as sf
+
+    # Encode float samples directly to MP3 when lameenc is available
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype('<i2').tobytes()
+    if encode_mp3(pcm, sample_rate, output_path):
+        return
+
+    # Save as WAV first
+    wav_path = output_path.with_suffix('.wav')
+    sf.write(str(wav_path), samples, sample_rate)
+
+    # Convert to MP3 if ffmpeg available
+    try:
+        run_quiet([
+            'ffmpeg', '-loglevel', 'error', '-i', str(wav_path),
+            '-codec:a', 'libmp3lame', '-qscale:a', '2',
+            str(output_path), '-y'
+        ])
+        wav_path.unlink(missing_ok=True)
+    except FileNotFoundError:
+        pass  # Keep as WAV
+
+EDGE_VOICE = "ja-JP-NanamiNeural"
+EDGE_CONCURRENCY = 8  # In-flight requests to Microsoft's endpoint
+
+async def generate_edge(edge_tts, text: str, output_path: Path) -> bool:
+    """Generate audio using Microsoft Edge TTS (online, good quality)."""
+    try:
+        await edge_tts.Communicate(text, EDGE_VOICE).save(str(output_path))
+        return True
+    except Exception as e:
+        print(f"    Edge TTS error: {e}")
+        return False
+
+async def generate_edge_batch(jobs, on_done):
+    """Run all Edge TTS jobs on one event loop, EDGE_CONCURRENCY at a time."""
+    # Resolve the module once for the whole batch rather than per sentence
+    try:
+        import edge_tts
+    except ImportError:
+        print("Edge TTS not installed. Run: pip install edge-tts")
+        return
+
+    sem = asyncio.Semaphore(EDGE_CONCURRENCY)
+
+    async def one(job):
+        _, _, text, output_path = job
+        async with sem:
+            ok = await generate_edge(edge_tts, text, output_path)
+        on_done(job, ok)
+
+    await asyncio.gather(*(one(job) for job in jobs))
+
 def generate_kokoro(text: str, output_path: Path) -> bool:
     """Generate audio using Kokoro ONNX (on-device, good quality)."""
     try:
-        import soundfile as sf
-        
+        import soundfile  # noqa: F401  (used by save_samples)
+
         kokoro = get_kokoro()
         if not kokoro:
             print("    Kokoro models not found in models/")
@@ -104,21 +227,7 @@ def generate_kokoro(text: str, output_path: Path) -> bool:
             is_phonemes=(g2p is not None)
         )
 
-        # Save as WAV first
-        wav_path = output_path.with_suffix('.wav')
-        sf.write(str(wav_path), samples, sample_rate)
-
-        # Convert to MP3 if ffmpeg available
-        try:
-            subprocess.run([
-                'ffmpeg', '-i', str(wav_path),
-                '-codec:a', 'libmp3lame', '-qscale:a', '2',
-                str(output_path), '-y'
-            ], check=True, capture_output=True)
-            wav_path.unlink(missing_ok=True)
-        except FileNotFoundError:
-            output_path = wav_path  # Keep as WAV
-
+        save_samples(samples, sample_rate, output_path)
         return True
     except ImportError:
         print("    Kokoro not installed. Run: pip install kokoro-onnx soundfile")
@@ -128,32 +237,18 @@ def generate_kokoro(text: str, output_path: Path) -> bool:
         return False
 
 def generate_macos(text: str, output_path: Path) -> bool:
-    """Generate audio using macOS say command with Kyoko voice."""
+    """Generate audio using macOS say command with Kyoko voice.
+
+    say writes AAC (.m4a) directly, so output_path should use that suffix.
+    """
     try:
         # Use Kyoko (Japanese female voice)
-        # First generate AIFF, then convert to MP3
-        aiff_path = output_path.with_suffix('.aiff')
-
-        subprocess.run([
+        run_quiet([
             'say', '-v', 'Kyoko',
-            '-o', str(aiff_path),
+            '--file-format=m4af', '--data-format=aac',
+            '-o', str(output_path),
             text
-        ], check=True, capture_output=True)
-
-        # Convert to MP3 using afconvert
-        subprocess.run([
-            'afconvert', '-f', 'mp4f', '-d', 'aac',
-            str(aiff_path), str(output_path.with_suffix('.m4a'))
-        ], check=True, capture_output=True)
-
-        # Clean up AIFF
-        aiff_path.unlink(missing_ok=True)
-
-        # Rename m4a to mp3 (or keep as m4a)
-        m4a_path = output_path.with_suffix('.m4a')
-        if m4a_path.exists():
-            m4a_path.rename(output_path)
-
+        ])
         return True
     except Exception as e:
         print(f"    macOS TTS error: {e}")
@@ -166,7 +261,7 @@ def generate_voicevox(text: str, output_path: Path, speaker_id: int = 1) -> bool
         base_url = "http://localhost:50021"
 
         # Create audio query
-        query_response = requests.post(
+        query_response = voicevox_session.post(
             f"{base_url}/audio_query",
             params={"text": text, "speaker": speaker_id},
             timeout=30
@@ -175,7 +270,7 @@ def generate_voicevox(text: str, output_path: Path, speaker_id: int = 1) -> bool
         query = query_response.json()
 
         # Generate audio
-        audio_response = requests.post(
+        audio_response = voicevox_session.post(
             f"{base_url}/synthesis",
             params={"speaker": speaker_id},
             json=query,
@@ -183,6 +278,10 @@ def generate_voicevox(text: str, output_path: Path, speaker_id: int = 1) -> bool
         )
         audio_response.raise_for_status()
 
+        # Encode the returned WAV in memory when lameenc is available
+        if encode_wav_as_mp3(io.BytesIO(audio_response.content), output_path):
+            return True
+
         # Save as WAV
         wav_path = output_path.with_suffix('.wav')
         with open(wav_path, 'wb') as f:
@@ -190,11 +289,11 @@ def generate_voicevox(text: str, output_path: Path, speaker_id: int = 1) -> bool
 
         # Convert to MP3 using ffmpeg if available, otherwise keep WAV
         try:
-            subprocess.run([
-                'ffmpeg', '-i', str(wav_path),
+            run_quiet([
+                'ffmpeg', '-loglevel', 'error', '-i', str(wav_path),
                 '-codec:a', 'libmp3lame', '-qscale:a', '2',
                 str(output_path), '-y'
-            ], check=True, capture_output=True)
+            ])
             wav_path.unlink(missing_ok=True)
         except FileNotFoundError:
             # ffmpeg not installed, keep WAV
@@ -211,51 +310,19 @@ def generate_voicevox(text: str, output_path: Path, speaker_id: int = 1) -> bool
 def generate_qwen(text: str, output_path: Path) -> bool:
     """Generate audio using Qwen3-TTS via MLX (requires Apple Silicon)."""
     try:
-        from mlx_audio.tts.generate import generate_audio
-        import shutil
-
-        # Model and Voice configuration
-        model_id = "mlx-community/Qwen3-TTS-12Hz-0.6B-Base-4bit"
-        voice = "Ono_Anna" # Playful Japanese female voice
-        
-        # mlx-audio generate_audio often creates a directory or uses a prefix
-        # We'll use a temporary directory to catch its output
-        temp_dir = output_path.parent / f"temp_{output_path.stem}"
-        temp_dir.mkdir(parents=True, exist_ok=True)
-        
+        import numpy as np
+
+        model = get_qwen()
+
         # Generate audio
         # Note: we use lang_code='ja' although the model handles it via the voice
-        generate_audio(
-            text=text,
-            model=model_id,
-            voice=voice,
-            output_path=str(temp_dir),
-            verbose=False,
-            lang_code='ja'
-        )
-        
-        # Find the generated wav file (usually audio_000.wav)
-        wav_files = list(temp_dir.glob("*.wav"))
-        if not wav_files:
-            print("    Qwen TTS failed to produce a WAV file.")
-            shutil.rmtree(temp_dir, ignore_errors=True)
+        results = list(model.generate(text=text, voice=QWEN_VOICE, lang_code='ja'))
+        if not results:
+            print("    Qwen TTS produced no audio.")
             return False
-            
-        temp_wav = wav_files[0]
-        
-        # Convert to MP3
-        try:
-            subprocess.run([
-                'ffmpeg', '-i', str(temp_wav),
-                '-codec:a', 'libmp3lame', '-qscale:a', '2',
-                str(output_path), '-y'
-            ], check=True, capture_output=True)
-        except FileNotFoundError:
-            # Fallback to just copying the WAV if ffmpeg is missing
-            shutil.copy(temp_wav, output_path.with_suffix('.wav'))
 
-        # Cleanup temp directory
-        shutil.rmtree(temp_dir, ignore_errors=True)
+        samples = np.concatenate([np.array(r.audio) for r in results])
+        save_samples(samples, results[0].sample_rate, output_path)
         return True
     except ImportError:
         print("    mlx-audio not installed correctly. Run: pip install --upgrade git+https://github.com/Blaizzy/mlx-audio.git")
@@ -268,6 +335,24 @@ def clean_text(text: str) -> str:
     """Clean text for TTS."""
     return text.strip()
 
+def text_hash(text: str, voice: str) -> str:
+    """Short hash of the text and the engine/voice that spoke it, so edited
+    sentences or a switched voice invalidate cached audio."""
+    return hashlib.sha1(f"{voice}|{text}".encode('utf-8')).hexdigest()[:8]
+
+def is_up_to_date(output_path: Path, text: str, voice: str, entry) -> bool:
+    """True if output_path already holds audio for this exact text and voice.
+
+    entry is the previous manifest entry for this sentence, if any. Files
+    with no entry may be left over from an interrupted run and are redone,
+    as are entries without a hash, since nothing records their voice.
+    """
+    if entry is None or entry.get('sha') is None:
+        return False
+    if not output_path.exists() or output_path.stat().st_size == 0:
+        return False
+    return entry['sha'] == text_hash(text, voice)
+
 def main():
     parser = argparse.ArgumentParser(description="Generate audio for sentences")
     parser.add_argument("--tts", choices=["edge", "macos", "voicevox", "qwen", "kokoro"], default="edge",
@@ -280,6 +365,10 @@ def main():
                        help="Limit number of words (0=all)")
     parser.add_argument("--speaker", type=int, default=1,
                        help="VOICEVOX speaker ID (1=つくよみちゃん)")
+    parser.add_argument("--workers", type=int, default=4,
+                       help="Parallel TTS jobs for macos/voicevox")
+    parser.add_argument("--force", action="store_true",
+                       help="Regenerate audio even if an up-to-date file exists")
     args = parser.parse_args()
 
     # Load sentences
@@ -288,8 +377,7 @@ def main():
         print(f"Error: {input_path} not found")
         return
 
-    with open(input_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    data = load_json(input_path)
 
     if args.limit > 0:
         data = data[:args.limit]
@@ -300,58 +388,112 @@ def main():
 
     # Select TTS function
     if args.tts == "edge":
-        tts_func = generate_edge
-        print("Using Microsoft Edge TTS (ja-JP-NanamiNeural)")
+        tts_func = None  # Batched on one event loop below
+        voice = f"edge:{EDGE_VOICE}"
+        print(f"Using Microsoft Edge TTS ({EDGE_VOICE})")
     elif args.tts == "macos":
         tts_func = generate_macos
+        voice = "macos:Kyoko"
         print("Using macOS Kyoko voice")
     elif args.tts == "qwen":
         tts_func = generate_qwen
+        voice = f"qwen:{QWEN_MODEL_ID}:{QWEN_VOICE}"
         print("Using Qwen3-TTS (MLX)")
     elif args.tts == "kokoro":
         tts_func = generate_kokoro
+        voice = "kokoro:jf_alpha"
         print("Using Kokoro ONNX (jf_alpha)")
     else:
+        ensure_requests()  # Before the worker threads start
         tts_func = lambda text, path: generate_voicevox(text, path, args.speaker)
+        voice = f"voicevox:{args.speaker}"
         print(f"Using VOICEVOX (speaker {args.speaker})")
 
-    # Generate audio
-    audio_manifest = []
-    total_sentences = sum(len(item.get('sentences', [])) for item in data)
-    generated = 0
+    # macOS say produces AAC; every other engine produces MP3
+    suffix = ".m4a" if args.tts == "macos" else ".mp3"
 
+    # Entries saved by previous (possibly interrupted) runs, to resume from
+    manifest_path = output_dir / "manifest.json"
+    recorded = {}
+    if manifest_path.exists():
+        recorded = {(e['word'], e['sentence_index']): e
+                    for e in load_json(manifest_path)}
+
+    # Keep entries for words outside this run's data (--limit), so a partial
+    # run neither hides their audio from the PWA nor forces a re-render later
+    words = {item['word'] for item in data}
+    audio_manifest = [e for key, e in recorded.items() if key[0] not in words]
+
+    # Collect (word, sentence_index, text, output_path) jobs
+    jobs = []
+    skipped = 0
     for item in data:
         word = item['word']
-        print(f"\n{word} ({item['reading']})")
-
         for i, sentence in enumerate(item.get('sentences', [])):
-            filename = f"{word}_{i}.mp3"
-            output_path = output_dir / filename
-
-            print(f"  [{generated+1}/{total_sentences}] Generating audio...")
-
             cleaned_text = clean_text(sentence['japanese'])
             if not cleaned_text:
-                print("    Skipping empty text")
+                print(f"  {word} #{i}: Skipping empty text")
                 continue
-
-            if tts_func(cleaned_text, output_path):
+            output_path = output_dir / f"{word}_{i}{suffix}"
+            if not args.force and is_up_to_date(output_path, cleaned_text, voice,
+                                                recorded.get((word, i))):
                 audio_manifest.append({
                     "word": word,
                     "sentence_index": i,
-                    "file": filename
+                    "file": output_path.name,
+                    "sha": text_hash(cleaned_text, voice)
                 })
-                generated += 1
-            else:
-                print(f"    Failed to generate audio")
+                skipped += 1
+                continue
+            jobs.append((word, i, cleaned_text, output_path))
 
-            # Small delay to avoid overwhelming TTS
-            time.sleep(0.2)
+    if skipped:
+        print(f"Skipping {skipped} sentences with up-to-date audio (use --force to regenerate)")
 
-    # Save manifest
-    manifest_path = output_dir / "manifest.json"
-    with open(manifest_path, 'w', encoding='utf-8') as f:
-        json.dump(audio_manifest, f, ensure_ascii=False, indent=2)
+    # Generate audio
+    total_sentences = len(jobs)
+    done = 0
+    generated = 0
+
+    def on_done(job, ok):
+        nonlocal done, generated
+        word, i, text, output_path = job
+        done += 1
+        if ok:
+            audio_manifest.append({
+                "word": word,
+                "sentence_index": i,
+                "file": output_path.name,
+                "sha": text_hash(text, voice)
+            })
+            generated += 1
+            if generated % MANIFEST_SAVE_EVERY == 0:
+                save_json(audio_manifest, manifest_path)
+            print(f"  [{done}/{total_sentences}] {word} #{i}")
+        else:
+            print(f"  [{done}/{total_sentences}] {word} #{i}: Failed to generate audio")
+
+    try:
+        if tts_func is None:
+            asyncio.run(generate_edge_batch(jobs, on_done))
+        elif args.tts in THREADED_ENGINES:
+            with ThreadPoolExecutor(max_workers=args.workers) as executor:
+                futures = {executor.submit(tts_func, job[2], job[3]): job for job in jobs}
+                try:
+                    for future in as_completed(futures):
+                        on_done(futures[future], future.result())
+                except KeyboardInterrupt:
+                    # Drop queued jobs so the manifest is saved right after the
+                    # few in flight finish, not after the whole remaining list
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    raise
+        else:
+            for job in jobs:
+                _, _, cleaned_text, output_path = job
+                on_done(job, tts_func(cleaned_text, output_path))
+    finally:
+        # Save manifest (also on Ctrl-C, so the next run resumes from here)
+        save_json(audio_manifest, manifest_path)
 
     print(f"\n\nDone! Generated {generated} audio files")
     print(f"Output: {output_dir}")
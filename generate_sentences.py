@@ -13,56 +13,79 @@ Usage:
 
     # Limit to N words (for testing):
     python generate_sentences.py --limit 20
+
+    # More requests in flight (remote/hosted OpenAI-compatible APIs):
+    python generate_sentences.py --api custom --base-url https://... --workers 16
+
+    # One word per request (small models that lose track of longer lists):
+    python generate_sentences.py --batch-size 1
+
+    # Redo words already in the output, with fresh LLM calls (e.g. after a
+    # prompt change):
+    python generate_sentences.py --force --no-cache
 """
 
-import json
 import argparse
+import hashlib
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import Optional
-
-def call_ollama(prompt: str, model: str = "mistral") -> str:
-    """Call Ollama API."""
-    response = requests.post(
-        "http://localhost:11434/api/generate",
-        json={"model": model, "prompt": prompt, "stream": False},
-        timeout=120
-    )
-    response.raise_for_status()
-    return response.json()["response"]
-
-def call_lmstudio(prompt: str) -> str:
-    """Call LM Studio API (OpenAI-compatible)."""
-    response = requests.post(
-        "http://localhost:1234/v1/completions",
-        json={
-            "prompt": prompt,
-            "max_tokens": 500,
-            "temperature": 0.7,
-        },
-        timeout=120
-    )
-    response.raise_for_status()
-    return response.json()["choices"][0]["text"]
-
-def call_openai_compatible(prompt: str, base_url: str) -> str:
-    """Call any OpenAI-compatible API."""
-    response = requests.post(
-        f"{base_url}/v1/completions",
-        json={
-            "prompt": prompt,
-            "max_tokens": 500,
-            "temperature": 0.7,
-        },
-        timeout=120
-    )
-    response.raise_for_status()
-    return response.json()["choices"][0]["text"]
-
-def generate_sentences(word: dict, call_llm) -> dict:
-    """Generate practice sentences for a vocabulary word."""
-
-    prompt = f"""You are a Japanese language teacher using neuroscience-based learning. Create 2 example sentences using this vocabulary word.
+from requests.adapters import HTTPAdapter
+
+from json_io import dumps, load_json, loads, open_atomic, write_atomic
+
+def load_jsonl(path: Path) -> list:
+    """Load a JSON Lines file, skipping a truncated last line from a crash."""
+    if not path.exists():
+        return []
+    records = []
+    with open(path, "rb") as f:
+        for line in f:
+            try:
+                records.append(loads(line))
+            except ValueError:
+                continue
+    return records
+
+def open_checkpoint(path: Path):
+    """Open a JSON Lines file for appending, terminating any truncated last line."""
+    f = open(path, "ab")
+    if f.tell():
+        with open(path, "rb") as existing:
+            existing.seek(-1, 2)
+            if existing.read(1) != b"\n":
+                f.write(b"\n")
+    return f
+
+def jsonl_line(obj) -> bytes:
+    """Serialize obj as a single JSON Lines record."""
+    return dumps(obj, indent=False) + b"\n"
+
+def save_json_array(records: list, path: Path):
+    """Write records as a UTF-8 JSON array, one record per line.
+
+    Records are serialized one at a time, so the whole output never sits in
+    memory as a single string.
+    """
+    with open_atomic(path) as f:
+        f.write(b"[\n")
+        for i, record in enumerate(records):
+            if i:
+                f.write(b",\n")
+            f.write(dumps(record, indent=False))
+        f.write(b"\n]\n")
+
+LLM_CACHE_DIR = Path(__file__).parent / "data" / "llm_cache"
+
+# Shared keep-alive pool for all worker threads
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_maxsize=32))
+SESSION.mount("https://", HTTPAdapter(pool_maxsize=32))
+
+# Identical for every request, so local servers (Ollama, llama.cpp, LM Studio)
+# can reuse the KV cache for this prefix; only the short user message varies
+TEACHER_PROMPT = """You are a Japanese language teacher using neuroscience-based learning. Create 2 example sentences for each vocabulary word the user gives you.
 
     **CORE RULE: HIGH VALENCE.**
     Human memory prioritizes information associated with strong emotions, danger, absurdity, or humor.
@@ -74,72 +97,248 @@ def generate_sentences(word: dict, call_llm) -> dict:
     - Strong Emotion (e.g., intense love, furious anger, crushing despair)
     - Social Taboo / Embarrassment
 
-Word: {word['characters']}
-Reading: {word['reading']}
-Meaning: {word['meaning']}
-
 Requirements:
 1. Sentence 1: A situation involving **Danger or Urgency**.
 2. Sentence 2: A situation involving **Absurdity or Humor**.
 3. Use simple grammar (JLPT N5-N4 level).
 4. Include furigana in parentheses for any kanji not in the target word.
+"""
 
-Format your response EXACTLY like this:
-SENTENCE1_JP: [Japanese sentence]
-SENTENCE1_EN: [English translation]
-SENTENCE2_JP: [Japanese sentence]
-SENTENCE2_EN: [English translation]
+SYSTEM_PROMPT = TEACHER_PROMPT + """
+Return ONLY valid JSON in EXACTLY this shape:
+{"s1_jp": "[Japanese sentence 1]", "s1_en": "[English translation 1]", "s2_jp": "[Japanese sentence 2]", "s2_en": "[English translation 2]"}
 
 Example for 病院 (びょういん) - hospital:
-SENTENCE1_JP: ゾンビに噛(か)まれたので、急いで病院に行きました！
-SENTENCE1_EN: I was bitten by a zombie, so I went to the hospital in a hurry!
-SENTENCE2_JP: この病院の院長(いんちょう)は、実は宇宙人(うちゅうじん)です。
-SENTENCE2_EN: The director of this hospital is actually an alien.
+{"s1_jp": "ゾンビに噛(か)まれたので、急いで病院に行きました！", "s1_en": "I was bitten by a zombie, so I went to the hospital in a hurry!", "s2_jp": "この病院の院長(いんちょう)は、実は宇宙人(うちゅうじん)です。", "s2_en": "The director of this hospital is actually an alien."}
 """
 
+BATCH_SYSTEM_PROMPT = TEACHER_PROMPT + """
+Return ONLY valid JSON in EXACTLY this shape, with one entry per word and its ID copied from the user's list:
+{"results": [{"id": 123, "s1_jp": "[Japanese sentence 1]", "s1_en": "[English translation 1]", "s2_jp": "[Japanese sentence 2]", "s2_en": "[English translation 2]"}]}
+
+Example for ID 123, 病院 (びょういん) - hospital:
+{"results": [{"id": 123, "s1_jp": "ゾンビに噛(か)まれたので、急いで病院に行きました！", "s1_en": "I was bitten by a zombie, so I went to the hospital in a hurry!", "s2_jp": "この病院の院長(いんちょう)は、実は宇宙人(うちゅうじん)です。", "s2_en": "The director of this hospital is actually an alien."}]}
+"""
+
+SENTENCE_KEYS = ["s1_jp", "s1_en", "s2_jp", "s2_en"]
+
+# Words per LLM request; one longer prompt is much cheaper than several short
+# ones on local servers, but small models start dropping words past ~10
+BATCH_SIZE = 8
+MAX_TOKENS_PER_WORD = 500
+
+# Constrains OpenAI-compatible servers (LM Studio, llama.cpp, OpenAI) to the
+# shape above, so replies parse without hand-rolled text handling
+RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "sentences",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {key: {"type": "string"} for key in SENTENCE_KEYS},
+            "required": SENTENCE_KEYS,
+            "additionalProperties": False,
+        },
+    },
+}
+
+# Root must be an object for strict schemas, so the list sits under "results"
+BATCH_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "sentence_batch",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "results": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {"id": {"type": "integer"},
+                                       **{key: {"type": "string"} for key in SENTENCE_KEYS}},
+                        "required": ["id", *SENTENCE_KEYS],
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            "required": ["results"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+def word_prompt(word: dict) -> str:
+    return f"Word: {word['characters']}\nReading: {word['reading']}\nMeaning: {word['meaning']}"
+
+def build_messages(word: dict) -> list:
+    """Chat messages for one word: the shared system prompt plus the word itself."""
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": word_prompt(word)},
+    ]
+
+def build_batch_messages(words: list) -> list:
+    """Chat messages for several words, each tagged with its subject ID."""
+    listing = "\n\n".join(f"ID: {word.get('id')}\n{word_prompt(word)}" for word in words)
+    return [
+        {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+        {"role": "user", "content": listing},
+    ]
+
+def messages_prompt(messages: list) -> str:
+    return "\n".join(m["content"] for m in messages)
+
+def call_ollama(messages: list, model: str = "mistral", max_tokens: int = MAX_TOKENS_PER_WORD) -> str:
+    """Call Ollama chat API."""
+    response = SESSION.post(
+        "http://localhost:11434/api/chat",
+        json={"model": model, "messages": messages, "format": "json", "stream": False,
+              "options": {"num_predict": max_tokens}},
+        timeout=120
+    )
+    response.raise_for_status()
+    return response.json()["message"]["content"]
+
+def call_lmstudio(messages: list, response_format: dict = RESPONSE_FORMAT,
+                  max_tokens: int = MAX_TOKENS_PER_WORD) -> str:
+    """Call LM Studio API (OpenAI-compatible)."""
+    return call_openai_compatible(messages, "http://localhost:1234", response_format, max_tokens)
+
+def call_openai_compatible(messages: list, base_url: str, response_format: dict = RESPONSE_FORMAT,
+                           max_tokens: int = MAX_TOKENS_PER_WORD) -> str:
+    """Call any OpenAI-compatible chat completions API."""
+    response = SESSION.post(
+        f"{base_url}/v1/chat/completions",
+        json={
+            "messages": messages,
+            "response_format": response_format,
+            "max_tokens": max_tokens,
+            "temperature": 0.7,
+        },
+        timeout=120
+    )
+    response.raise_for_status()
+    return response.json()["choices"][0]["message"]["content"]
+
+def parse_object(response: str) -> dict:
+    """Parse the JSON object in a model reply."""
+    # Tolerate models that wrap the object in prose or ``` fences
+    start, end = response.find("{"), response.rfind("}")
+    if start == -1 or end < start:
+        raise ValueError("no JSON object in response")
+    return loads(response[start:end + 1])
+
+def parse_sentences(response: str) -> list:
+    """Extract the two sentence pairs from the model's JSON reply."""
+    return sentence_pairs(parse_object(response))
+
+def sentence_pairs(obj: dict) -> list:
+    """Keep the sentence pairs in obj where both halves are non-empty."""
+    sentences = []
+    for n in ("1", "2"):
+        japanese, english = obj.get(f"s{n}_jp"), obj.get(f"s{n}_en")
+        if isinstance(japanese, str) and isinstance(english, str) and japanese.strip() and english.strip():
+            sentences.append({"japanese": japanese.strip(), "english": english.strip()})
+    return sentences
+
+def cache_key(word: dict, prompt: str) -> str:
+    """Key a cached LLM response by subject ID and the word's single-word prompt.
+
+    Batched replies are stored per word under this same key, so a changed
+    prompt invalidates them just like single-word replies.
+    """
+    return hashlib.blake2b(f"{word.get('id')}|{prompt}".encode("utf-8"), digest_size=16).hexdigest()
+
+def read_cache(cache_dir: Optional[Path], key: str) -> Optional[str]:
+    if cache_dir is None:
+        return None
+    path = cache_dir / f"{key}.txt"
+    if path.exists():
+        return path.read_text(encoding="utf-8")
+    return None
+
+def write_cache(cache_dir: Optional[Path], key: str, response: str):
+    if cache_dir is None:
+        return
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    write_atomic(cache_dir / f"{key}.txt", response.encode("utf-8"))
+
+def generate_sentences(word: dict, call_llm, cache_dir: Optional[Path] = None) -> dict:
+    """Generate practice sentences for a vocabulary word.
+
+    If cache_dir is given, a stored response for the same word and prompt is
+    reused instead of calling the LLM.
+    """
+
+    messages = build_messages(word)
+    prompt = messages_prompt(messages)
+
     try:
-        response = call_llm(prompt)
-
-        # Parse response
-        lines = response.strip().split("\n")
-        sentences = []
-
-        current = {}
-        for line in lines:
-            line = line.strip()
-            if line.startswith("SENTENCE1_JP:"):
-                current["japanese"] = line.replace("SENTENCE1_JP:", "").strip()
-            elif line.startswith("SENTENCE1_EN:"):
-                current["english"] = line.replace("SENTENCE1_EN:", "").strip()
-                if "japanese" in current:
-                    sentences.append(current.copy())
-                    current = {}
-            elif line.startswith("SENTENCE2_JP:"):
-                current["japanese"] = line.replace("SENTENCE2_JP:", "").strip()
-            elif line.startswith("SENTENCE2_EN:"):
-                current["english"] = line.replace("SENTENCE2_EN:", "").strip()
-                if "japanese" in current:
-                    sentences.append(current.copy())
-
-        return {
-            "subject_id": word.get("id"),
-            "word": word["characters"],
-            "reading": word["reading"],
-            "meaning": word["meaning"],
-            "level": word["level"],
-            "sentences": sentences
-        }
+        key = cache_key(word, prompt)
+        response = read_cache(cache_dir, key)
+        from_cache = response is not None
+        if not from_cache:
+            response = call_llm(messages)
+
+        sentences = parse_sentences(response)
+
+        # Only keep responses that parsed, so a bad one is retried next run
+        if sentences and not from_cache:
+            write_cache(cache_dir, key, response)
+
+        return sentence_record(word, sentences)
 
     except Exception as e:
         print(f"  Error generating for {word['characters']}: {e}")
-        return {
-            "subject_id": word.get("id"),
-            "word": word["characters"],
-            "reading": word["reading"],
-            "meaning": word["meaning"],
-            "level": word["level"],
-            "sentences": []
-        }
+        return sentence_record(word, [])
+
+def sentence_record(word: dict, sentences: list) -> dict:
+    return {
+        "subject_id": word.get("id"),
+        "word": word["characters"],
+        "reading": word["reading"],
+        "meaning": word["meaning"],
+        "level": word["level"],
+        "sentences": sentences
+    }
+
+def generate_sentences_batch(words: list, call_llm, cache_dir: Optional[Path] = None) -> list:
+    """Generate practice sentences for several words with one LLM request.
+
+    Each word's reply is cached under its single-word key, so cached words are
+    left out of the request and later runs can regroup words freely. Words the
+    model skipped or garbled are retried one at a time.
+    """
+
+    keys = [cache_key(word, messages_prompt(build_messages(word))) for word in words]
+    uncached = [i for i, key in enumerate(keys) if read_cache(cache_dir, key) is None]
+    replies = {}
+
+    if len(uncached) > 1:
+        batch = [words[i] for i in uncached]
+        try:
+            response = call_llm(build_batch_messages(batch), BATCH_RESPONSE_FORMAT,
+                                MAX_TOKENS_PER_WORD * len(batch))
+            items = parse_object(response).get("results")
+            # Match on str(id) in case the model quotes the IDs
+            replies = {str(item.get("id")): item for item in items if isinstance(item, dict)}
+        except Exception as e:
+            print(f"  Error generating batch of {len(batch)}, retrying one by one: {e}")
+
+    results = []
+    for word, key in zip(words, keys):
+        item = replies.get(str(word.get("id")))
+        sentences = sentence_pairs(item) if item else []
+        if len(sentences) < 2:
+            # Cached, skipped by the model, or only half answered
+            results.append(generate_sentences(word, call_llm, cache_dir))
+            continue
+
+        write_cache(cache_dir, key, dumps({k: item[k] for k in SENTENCE_KEYS}, indent=False).decode("utf-8"))
+        results.append(sentence_record(word, sentences))
+    return results
 
 def main():
     parser = argparse.ArgumentParser(description="Generate sentences for WaniKani vocab")
@@ -149,17 +348,26 @@ def main():
     parser.add_argument("--limit", type=int, default=0, help="Limit number of words (0=all)")
     parser.add_argument("--input", default="data/vocab.json", help="Input vocab file")
     parser.add_argument("--output", default="data/sentences.json", help="Output sentences file")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent LLM requests")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Words per LLM request")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Call the LLM instead of reusing responses cached in data/llm_cache/ "
+                             "(words already in the output are still skipped; see --force)")
+    parser.add_argument("--force", action="store_true",
+                        help="Regenerate every word in the vocab, even ones already in the output")
     args = parser.parse_args()
 
     # Set up LLM caller
     if args.api == "ollama":
-        call_llm = lambda p: call_ollama(p, args.model)
+        call_llm = lambda m, response_format=None, max_tokens=MAX_TOKENS_PER_WORD: \
+            call_ollama(m, args.model, max_tokens)
         print(f"Using Ollama with model: {args.model}")
     elif args.api == "lmstudio":
         call_llm = call_lmstudio
         print("Using LM Studio")
     else:
-        call_llm = lambda p: call_openai_compatible(p, args.base_url)
+        call_llm = lambda m, response_format=RESPONSE_FORMAT, max_tokens=MAX_TOKENS_PER_WORD: \
+            call_openai_compatible(m, args.base_url, response_format, max_tokens)
         print(f"Using custom API at: {args.base_url}")
 
     # Load vocab
@@ -168,33 +376,65 @@ def main():
         print(f"Error: {input_path} not found. Run fetch_vocab.py first.")
         return
 
-    with open(input_path, "r", encoding="utf-8") as f:
-        vocab = json.load(f)
+    vocab = load_json(input_path)
 
     if args.limit > 0:
         vocab = vocab[:args.limit]
 
-    print(f"\nGenerating sentences for {len(vocab)} words...")
-
-    results = []
-    for i, word in enumerate(vocab):
-        print(f"[{i+1}/{len(vocab)}] {word['characters']} ({word['reading']})...")
-        result = generate_sentences(word, call_llm)
-        results.append(result)
-
-        # Progress save every 10 words
-        if (i + 1) % 10 == 0:
-            output_path = Path(__file__).parent / args.output
-            with open(output_path, "w", encoding="utf-8") as f:
-                json.dump(results, f, ensure_ascii=False, indent=2)
-
-    # Final save
     output_path = Path(__file__).parent / args.output
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
+    cache_dir = None if args.no_cache else LLM_CACHE_DIR
+    checkpoint_path = output_path.with_suffix(".jsonl")
+
+    # Skip words a previous run already finished, whether it completed
+    # (output file) or was interrupted (append-only checkpoint)
+    existing = load_json(output_path) if output_path.exists() else []
+    finished = {r["subject_id"]: r for r in existing + load_jsonl(checkpoint_path) if r.get("sentences")}
+    results = [None if args.force else finished.get(word.get("id")) for word in vocab]
+    pending = [i for i, result in enumerate(results) if result is None]
+    if len(pending) < len(vocab):
+        print(f"Resuming: {len(vocab) - len(pending)} words already in "
+              f"{output_path.name} or {checkpoint_path.name}")
+
+    print(f"\nGenerating sentences for {len(pending)} words...")
+
+    # Batches are independent; keep a few in flight and slot results back
+    # into vocab order as they complete
+    batch_size = max(args.batch_size, 1)
+    batches = [pending[start:start + batch_size] for start in range(0, len(pending), batch_size)]
+    done = 0
+    with open_checkpoint(checkpoint_path) as checkpoint, \
+            ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(generate_sentences_batch, [vocab[i] for i in batch], call_llm, cache_dir): batch
+                   for batch in batches}
+        try:
+            for future in as_completed(futures):
+                for i, result in zip(futures[future], future.result()):
+                    results[i] = result
+                    done += 1
+                    print(f"[{done}/{len(pending)}] {vocab[i]['characters']} ({vocab[i]['reading']})")
+
+                    # Append one line per word instead of rewriting the whole output
+                    checkpoint.write(jsonl_line(result))
+                checkpoint.flush()
+        except KeyboardInterrupt:
+            # Drop queued batches so Ctrl-C doesn't keep calling the LLM for
+            # the rest of the vocab; only requests already in flight finish
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    # Keep finished words outside this run's vocab (--limit, or dropped from
+    # a re-fetched vocab.json) so a partial run never shrinks the output
+    vocab_ids = {word.get("id") for word in vocab}
+    kept = [r for r in finished.values() if r["subject_id"] not in vocab_ids]
+
+    # Final save; the checkpoint is only needed to recover from a crash
+    save_json_array(kept + results, output_path)
+    checkpoint_path.unlink(missing_ok=True)
 
     total_sentences = sum(len(r["sentences"]) for r in results)
     print(f"\nDone! Generated {total_sentences} sentences for {len(results)} words.")
+    if kept:
+        print(f"Kept {len(kept)} previously generated words not in this run's vocab.")
     print(f"Saved to: {output_path}")
 
 if __name__ == "__main__":
@@ -0,0 +1,59 @@
+"""
+JSON helpers shared by the scripts.
+
+Uses orjson when it is installed and falls back to the stdlib json module
+otherwise; both produce the same UTF-8, non-ASCII-escaped output. Every file
+is written through a temp file and renamed into place, so a crash or a
+concurrent reader (serve.py, the PWA) never sees a half-written file.
+"""
+
+import json
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # Fall back to stdlib json
+
+JSONDecodeError = orjson.JSONDecodeError if orjson else json.JSONDecodeError
+
+def loads(raw):
+    """Parse JSON from UTF-8 bytes or a str."""
+    if orjson:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+def dumps(obj, indent: bool = True) -> bytes:
+    """Serialize obj as UTF-8 JSON, 2-space indented unless indent=False."""
+    if orjson:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else None)
+    if indent:
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+@contextmanager
+def open_atomic(path: Path):
+    """Open a temp file next to path for binary writing and rename it over
+    path once the block exits cleanly; on error path is left untouched."""
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            yield f
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    tmp_path.replace(path)
+
+def write_atomic(path: Path, body: bytes):
+    """Atomically replace path with body."""
+    with open_atomic(path) as f:
+        f.write(body)
+
+def load_json(path: Path):
+    """Load a JSON file."""
+    return loads(path.read_bytes())
+
+def save_json(obj, path: Path):
+    """Atomically write obj as UTF-8, 2-space indented JSON."""
+    write_atomic(path, dumps(obj))
@@ -1,6 +1,10 @@
 #!/usr/bin/env python3
+import datetime
+import email.utils
 import http.server
+import io
 import socketserver
+import socket
 import os
 import sys
 
@@ -9,12 +13,82 @@ PORT = 8000
 class ThreadingHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
     daemon_threads = True
 
+class Handler(http.server.SimpleHTTPRequestHandler):
+    """Static file handler that lets the kernel copy file bodies to the socket."""
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def not_modified_since(self, mtime: float) -> bool:
+        """Same If-Modified-Since test SimpleHTTPRequestHandler applies to
+        plain files, so precompressed responses revalidate with a 304 too."""
+        if "If-Modified-Since" not in self.headers or "If-None-Match" in self.headers:
+            return False
+        try:
+            ims = email.utils.parsedate_to_datetime(self.headers["If-Modified-Since"])
+        except (TypeError, IndexError, OverflowError, ValueError):
+            return False
+        if ims.tzinfo is None:
+            ims = ims.replace(tzinfo=datetime.timezone.utc)
+        if ims.tzinfo is not datetime.timezone.utc:
+            return False
+        last_modified = datetime.datetime.fromtimestamp(mtime, datetime.timezone.utc)
+        return last_modified.replace(microsecond=0) <= ims
+
+    def send_head(self):
+        # Prefer a precompressed sibling (e.g. sentences.json.gz written by
+        # sync_to_pwa.py) when the client accepts gzip and it isn't stale
+        path = self.translate_path(self.path)
+        gz_path = path + ".gz"
+        if ("gzip" in self.headers.get("Accept-Encoding", "")
+                and os.path.isfile(path) and os.path.isfile(gz_path)
+                and os.path.getmtime(gz_path) >= os.path.getmtime(path)):
+            # Validators describe the original file, not the .gz sibling
+            mtime = os.path.getmtime(path)
+            if self.not_modified_since(mtime):
+                self.send_response(304)
+                self.send_header("Vary", "Accept-Encoding")
+                self.end_headers()
+                return None
+            try:
+                f = open(gz_path, "rb")
+            except OSError:
+                return super().send_head()
+            fs = os.fstat(f.fileno())
+            self.send_response(200)
+            self.send_header("Content-Type", self.guess_type(path))
+            self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(fs.st_size))
+            self.send_header("Last-Modified", self.date_time_string(mtime))
+            self.send_header("Vary", "Accept-Encoding")
+            self.end_headers()
+            return f
+        return super().send_head()
+
+    def copyfile(self, source, outputfile):
+        # Directory listings are in-memory buffers with no file descriptor
+        try:
+            in_fd = source.fileno()
+        except (AttributeError, io.UnsupportedOperation):
+            in_fd = None
+        if in_fd is None or not hasattr(os, "sendfile"):
+            return super().copyfile(source, outputfile)
+
+        outputfile.flush()
+        offset = source.tell()
+        remaining = os.fstat(in_fd).st_size - offset
+        while remaining > 0:
+            sent = os.sendfile(self.connection.fileno(), in_fd, offset, remaining)
+            if sent == 0:
+                break
+            offset += sent
+            remaining -= sent
+
 def main():
     # Change to the project root directory
     os.chdir(os.path.dirname(os.path.abspath(__file__)))
     
-    Handler = http.server.SimpleHTTPRequestHandler
-    
     # Allow address reuse to avoid "Address already in use" errors on restart
     socketserver.TCPServer.allow_reuse_address = True
     
@@ -8,17 +8,55 @@ be synced to your phone via iCloud/Dropbox.
 Usage:
     python sync_to_pwa.py
 
+    # Drop sentences that don't contain the exact dictionary form of the word
+    python sync_to_pwa.py --strict
+
 For iCloud sync:
     1. Move the 'pwa' folder to your iCloud Drive
     2. Run this script after generating new sentences
     3. Open the PWA on your phone - data will be available
 """
 
-import json
-import shutil
+import argparse
+import gzip
 from pathlib import Path
 
+from json_io import dumps, loads, write_atomic
+
+def clean(data: list, strict: bool = False) -> tuple[list, int]:
+    """Check each sentence contains its target word.
+
+    By default mismatches are only counted, since conjugated forms won't
+    match the dictionary form; with strict=True they are dropped. Words
+    left with no sentences are removed either way. Returns the cleaned
+    data and the number of mismatched sentences.
+    """
+    cleaned_data = []
+    mismatch_count = 0
+
+    for item in data:
+        target_word = item['word']
+        sentences = item['sentences']
+
+        if strict:
+            valid_sentences = [s for s in sentences if target_word in s['japanese']]
+            mismatch_count += len(sentences) - len(valid_sentences)
+            item['sentences'] = sentences = valid_sentences
+        else:
+            # Only counting: no need to build a filtered list
+            mismatch_count += sum(target_word not in s['japanese'] for s in sentences)
+
+        if sentences:
+            cleaned_data.append(item)
+
+    return cleaned_data, mismatch_count
+
 def main():
+    parser = argparse.ArgumentParser(description="Sync sentences to the PWA folder")
+    parser.add_argument("--strict", action="store_true",
+                        help="Drop sentences missing the exact dictionary form of the word")
+    args = parser.parse_args()
+
     script_dir = Path(__file__).parent
     source = script_dir / "data" / "sentences.json"
     pwa_dir = script_dir / "pwa"
@@ -28,44 +66,37 @@ def main():
         print("Run fetch_vocab.py and generate_sentences.py first")
         return
 
-    with open(source, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    # Read once: the same bytes are parsed and, if nothing changes, copied
+    raw = source.read_bytes()
+    data = loads(raw)
+    word_count_before = len(data)
 
-    # Filter invalid sentences (log warnings but keep them)
-    cleaned_data = []
-    warning_count = 0
-    
-    for item in data:
-        target_word = item['word']
-        valid_sentences = []
-        
-        for sentence in item['sentences']:
-            # We keep all sentences even if exact word match fails (due to conjugation)
-            # Just log a warning for debugging
-            if target_word not in sentence['japanese']:
-                warning_count += 1
-                # print(f"Warning: '{target_word}' not found in '{sentence['japanese']}' (conjugation?)")
-            
-            valid_sentences.append(sentence)
-        
-        if valid_sentences:
-            item['sentences'] = valid_sentences
-            cleaned_data.append(item)
-    
-    data = cleaned_data
+    data, warning_count = clean(data, args.strict)
 
-    # Save to PWA folder
+    # Save to PWA folder; skip re-serializing when cleaning was a no-op
     dest = pwa_dir / "sentences.json"
-    with open(dest, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    if len(data) == word_count_before and not (args.strict and warning_count):
+        body = raw
+    else:
+        # Release the source bytes first so peak memory is the parsed data
+        # plus one serialized copy, not two
+        del raw
+        body = dumps(data)
+    write_atomic(dest, body)
+
+    # Precompressed copy for serve.py to send to clients that accept gzip
+    gz_dest = dest.with_suffix(".json.gz")
+    write_atomic(gz_dest, gzip.compress(body, compresslevel=9, mtime=0))
 
     word_count = len(data)
     sentence_count = sum(len(item.get('sentences', [])) for item in data)
 
     print(f"Synced to PWA: {word_count} words, {sentence_count} sentences")
-    if warning_count > 0:
+    if warning_count > 0 and args.strict:
+        print(f"  (Removed {warning_count} sentences that don't contain exact dictionary form of word)")
+    elif warning_count > 0:
         print(f"  (Note: {warning_count} sentences don't contain exact dictionary form of word)")
-    print(f"  → {dest}")
+    print(f"  → {dest} ({len(body):,} bytes, {gz_dest.stat().st_size:,} gzipped)")
     print()
     print("To use on mobile:")
     print("  1. Copy the 'pwa' folder to iCloud Drive")
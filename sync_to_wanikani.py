@@ -13,19 +13,62 @@ when you finish a training session.
 """
 
 import os
-import json
+import threading
+import time
 import requests
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from json_io import load_json, save_json
 
 API_KEY = os.environ.get("WANIKANI_API_KEY")
 BASE_URL = "https://api.wanikani.com/v2"
-
-def get_headers():
-    return {
-        "Authorization": f"Bearer {API_KEY}",
-        "Content-Type": "application/json"
-    }
+MAX_WORKERS = 8
+RATE_LIMIT_PER_MINUTE = 60  # WaniKani API limit
+
+# Shared session: keep-alive connection reuse + retry/backoff on rate limits
+SESSION = requests.Session()
+SESSION.headers.update({
+    "Authorization": f"Bearer {API_KEY}",
+    "Content-Type": "application/json"
+})
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=1,
+    pool_maxsize=8,
+    # The review POST is retried only on statuses that mean "not processed"
+    # (Retry-After is honoured); read errors and 500/502/504 are not retried,
+    # since the review may already have been recorded
+    max_retries=Retry(total=3, read=0, backoff_factor=0.3,
+                      status_forcelist=[429, 503], allowed_methods=None),
+))
+
+class RateLimiter:
+    """Sliding window shared by the worker threads: at most `rate` requests
+    start in any `period` seconds, including the first window of a run."""
+
+    def __init__(self, rate: int, period: float = 60.0):
+        self.rate = rate
+        self.period = period
+        self.starts = deque()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                while self.starts and now - self.starts[0] >= self.period:
+                    self.starts.popleft()
+                if len(self.starts) < self.rate:
+                    self.starts.append(now)
+                    return
+                wait = self.starts[0] + self.period - now
+            time.sleep(wait)
+
+RATE_LIMITER = RateLimiter(RATE_LIMIT_PER_MINUTE)
 
 def create_review(subject_id: int) -> bool:
     """Submit a correct review for a subject."""
@@ -39,7 +82,8 @@ def create_review(subject_id: int) -> bool:
     }
 
     try:
-        response = requests.post(url, headers=get_headers(), json=payload, timeout=30)
+        RATE_LIMITER.acquire()
+        response = SESSION.post(url, json=payload, timeout=30)
 
         if response.status_code == 201:
             return True
@@ -69,8 +113,7 @@ def main():
         print("Complete a training session and tap 'Sync to WaniKani' first.")
         return
 
-    with open(reviews_path, "r", encoding="utf-8") as f:
-        easy_reviews = json.load(f)
+    easy_reviews = load_json(reviews_path)
 
     if not easy_reviews:
         print("No reviews to sync.")
@@ -82,22 +125,27 @@ def main():
     success = 0
     failed = 0
 
-    for item in easy_reviews:
-        subject_id = item.get("subject_id")
-        word = item.get("word", "unknown")
-
-        if not subject_id:
-            print(f"  {word}: No subject_id, skipping")
-            failed += 1
-            continue
-
-        print(f"  {word} (id: {subject_id})...", end=" ")
-
-        if create_review(subject_id):
-            print("✓ Synced")
-            success += 1
-        else:
-            failed += 1
+    # Reviews are independent; submit several at once under the rate limit
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = {}
+        for item in easy_reviews:
+            subject_id = item.get("subject_id")
+            if not subject_id:
+                print(f"  {item.get('word', 'unknown')}: No subject_id, skipping")
+                failed += 1
+                continue
+            futures[executor.submit(create_review, subject_id)] = item
+
+        for future in as_completed(futures):
+            item = futures[future]
+            word = item.get("word", "unknown")
+
+            if future.result():
+                print(f"  {word} (id: {item['subject_id']})... ✓ Synced")
+                success += 1
+            else:
+                print(f"  {word} (id: {item['subject_id']})... ✗ Not synced")
+                failed += 1
 
     print(f"\nDone! Synced: {success}, Failed/Skipped: {failed}")
 
@@ -109,13 +157,12 @@ def main():
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         archive_path = archive_dir / f"synced_{timestamp}.json"
 
-        with open(archive_path, "w", encoding="utf-8") as f:
-            json.dump({
-                "synced_at": datetime.now().isoformat(),
-                "success": success,
-                "failed": failed,
-                "items": easy_reviews
-            }, f, ensure_ascii=False, indent=2)
+        save_json({
+            "synced_at": datetime.now().isoformat(),
+            "success": success,
+            "failed": failed,
+            "items": easy_reviews
+        }, archive_path)
 
         print(f"Archived to: {archive_path}")
 